@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+from pathlib import Path
+import shutil
+
+from PIL import Image, ImageOps
+import imagehash
+import pybktree
+
+# Allowed image extensions (customize if needed)
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tiff"}
+
+# pHash size: hash_size=16 gives a 256-bit hash
+HASH_SIZE = 16
+
+# Images whose hashes differ in at most this many bits count as duplicates
+MAX_DISTANCE = 6
+
+
+def is_image(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() in IMAGE_EXTS
+
+
+def phash_of_file(path: Path):
+    """Perceptual hash of an image as an int, or None if it can't be read."""
+    try:
+        img = ImageOps.exif_transpose(Image.open(path))
+        return int(str(imagehash.phash(img, hash_size=HASH_SIZE)), 16)
+    except Exception:
+        return None
+
+
+def hamming_distance(a, b) -> int:
+    return (a[0] ^ b[0]).bit_count()
+
+
+def dedup_similar(input_dir: Path, output_dir: Path, max_distance: int) -> None:
+    if not input_dir.is_dir():
+        raise ValueError(f"Input path is not a directory: {input_dir}")
+
+    # Create destination folder
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Largest files first, so the best-quality copy of each cluster is kept
+    src_paths = [p for p in input_dir.iterdir() if is_image(p)]
+    src_paths.sort(key=lambda p: p.stat().st_size, reverse=True)
+
+    count_total = len(src_paths)
+    count_duplicates = 0
+
+    existing = {entry.name for entry in os.scandir(output_dir)}
+    kept_paths = [output_dir / name for name in existing if is_image(output_dir / name)]
+
+    # Inputs kept by an earlier run are already in output_dir
+    count_copied = sum(1 for p in src_paths if p.name in existing)
+    src_paths = [p for p in src_paths if p.name not in existing]
+
+    # Hash in parallel, cluster in this process: an image is a duplicate if a
+    # kept image is within max_distance bits of it
+    tree = pybktree.BKTree(hamming_distance)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        # Images kept by earlier runs go into the tree first, so a new
+        # near-duplicate of one of them is dropped even if it's bigger
+        for kept_path, phash in zip(kept_paths, ex.map(phash_of_file, kept_paths, chunksize=32)):
+            if phash is not None:
+                tree.add((phash, kept_path))
+
+        hashes = ex.map(phash_of_file, src_paths, chunksize=32)
+        for src_path, phash in zip(src_paths, hashes):
+            if phash is not None:
+                item = (phash, src_path)
+                if tree.find(item, max_distance):
+                    count_duplicates += 1
+                    continue
+                tree.add(item)
+
+            # Unreadable images are passed through so the OCR filter rejects them
+            shutil.copy2(src_path, output_dir / src_path.name)
+            existing.add(src_path.name)
+            count_copied += 1
+
+            # Log every 100 copies (optional)
+            if count_copied % 100 == 0:
+                print(f"[INFO] Kept {count_copied} images so far...")
+
+    print("--------------------------------------------------")
+    print(f"Total image files found: {count_total}")
+    print(f"Kept in {output_dir}: {count_copied}")
+    print(f"Skipped (near-duplicates by pHash): {count_duplicates}")
+    print("Done.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Drop near-duplicate images (re-encodes, resizes) from a flat "
+            "folder using perceptual hashes, keeping one image per cluster "
+            "in 'data_raw_unique'. Run after flatten_images.py and before "
+            "filter_no_text.py."
+        )
+    )
+    parser.add_argument(
+        "input_dir",
+        type=str,
+        help="Path to the flat folder produced by flatten_images.py.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=None,
+        help=(
+            "Optional explicit output directory. "
+            "If not provided, 'data_raw_unique' will be created next to input_dir."
+        ),
+    )
+    parser.add_argument(
+        "--max-distance",
+        type=int,
+        default=MAX_DISTANCE,
+        help="Maximum Hamming distance between pHashes to count as duplicates.",
+    )
+
+    args = parser.parse_args()
+    input_dir = Path(args.input_dir).expanduser().resolve()
+
+    if args.output_dir is None:
+        output_dir = input_dir.parent / "data_raw_unique"
+    else:
+        output_dir = Path(args.output_dir).expanduser().resolve()
+
+    print(f"[INFO] Input directory:  {input_dir}")
+    print(f"[INFO] Output directory: {output_dir}")
+
+    dedup_similar(input_dir, output_dir, args.max_distance)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,67 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import collections
+import contextlib
 from pathlib import Path
 from PIL import Image, ImageOps
 import numpy as np
+import cv2
 import easyocr
+import io
+import itertools
+import numba
+import os
+import pickle
+import queue
 import shutil
+import sqlite3
+import threading
+import torch
 from tqdm import tqdm
 
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    TJ = TurboJPEG()
+except (ImportError, RuntimeError):  # optional, falls back to OpenCV
+    TJ = None
+
 # -------- CONFIG --------
-SRC_DIR = Path("data_raw_all")          # all scraped images
+SRC_DIR = Path("data_raw_unique")       # scraped images after dedup_similar.py
 DST_DIR = Path("data_raw_no_text")      # images with no text or only overlays
 REJECTED_DIR = Path("data_raw_rejected")  # images with meme-like text or errors
 
 ALLOWED_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
+JPEG_EXTS = {".jpg", ".jpeg"}
 
 # If total chars < this, we treat it as "no text"
 MIN_TOTAL_CHARS = 3
 
 USE_GPU = True  # set False if you want CPU
+USE_FP16 = False  # half-precision OCR on CUDA; compare with FP32 on a sample before enabling
+
+# Batched OCR: every image is shrunk and padded onto a fixed canvas so a whole
+# batch can go through reader.readtext_batched in one call.
+BATCH_SIZE = 16
+OCR_WIDTH = 1024
+OCR_HEIGHT = 1024
+
+# Decoding runs on a thread pool ahead of the OCR, copies on a small pool of their own
+DECODE_WORKERS = os.cpu_count() or 4
+COPY_WORKERS = 4
+
+# Cheap OpenCV prefilter: images with no sharp detail or almost no edges can't
+# hold text, so they skip the OCR and are kept as "none"
+USE_TEXT_PREFILTER = True
+PREFILTER_SIZE = 256                  # prefilter works on a thumbnail this big
+PREFILTER_MIN_LAPLACIAN_VAR = 100.0   # below this the image is too smooth for text
+PREFILTER_MIN_EDGE_DENSITY = 0.02     # fraction of pixels in closed edge runs
+PREFILTER_WORKERS = os.cpu_count() or 4  # threads; OpenCV releases the GIL
+PREFILTER_AHEAD = 4 * BATCH_SIZE      # prefilter checks kept in flight
+
+# Raw OCR results are cached per image, keyed by the content-hash filename from
+# flatten_images.py, so re-runs (e.g. threshold tuning) skip the OCR. The cache
+# is cleared automatically when the OCR settings (canvas, FP16, EasyOCR version) change.
+OCR_CACHE = Path(".ocr_cache.sqlite")
+CACHE_COMMIT_EVERY = 500
 
 # Heuristic thresholds (tune these)
 MAX_OVERLAY_TOTAL_AREA_RATIO = 0.08   # overlays should occupy < 8% of total image area
@@ -32,77 +78,363 @@ def is_image(path: Path) -> bool:
     return path.suffix.lower() in ALLOWED_EXTS
 
 
-def classify_text_type(img: Image.Image, reader: easyocr.Reader) -> str:
+# Marks images the prefilter let skip the OCR
+NO_TEXT = object()
+
+# OpenCV decodes JPEGs at 1/2, 1/4 or 1/8 size much faster than at full size
+REDUCED_GRAYSCALE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+}
+
+
+def prefilter_read_flag(data: bytes) -> int:
+    """
+    Largest OpenCV reduction that still leaves the image at least
+    PREFILTER_SIZE on its long side, from the size in the image header.
     """
-    Classify the image into:
-      - "none"    : no relevant text
-      - "overlay" : small overlays (timestamps, camera UI, VHS subs, etc.)
-      - "meme"    : big caption / meme-style text
+    try:
+        long_side = max(Image.open(io.BytesIO(data)).size)
+    except Exception:
+        return cv2.IMREAD_GRAYSCALE
 
-    This is heuristic: use bounding box area, total area, and char count.
+    for factor, flag in REDUCED_GRAYSCALE_FLAGS.items():
+        if long_side // factor >= PREFILTER_SIZE:
+            return flag
+    return cv2.IMREAD_GRAYSCALE
+
+
+def likely_has_text(path: Path) -> bool:
     """
-    img = ImageOps.exif_transpose(img).convert("RGB")
-    arr = np.array(img)
-    h, w = arr.shape[0], arr.shape[1]
-    img_area = float(w * h)
+    Cheap check on a grayscale thumbnail: text needs sharp detail (Laplacian
+    variance) and edges that close into horizontal runs. Only images failing
+    it skip the OCR, so anything unreadable returns True and goes the normal
+    route.
+    """
+    try:
+        data = path.read_bytes()
+        gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), prefilter_read_flag(data))
+    except Exception:
+        return True
+    if gray is None:
+        return True
+
+    h, w = gray.shape
+    scale = PREFILTER_SIZE / max(h, w)
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    if cv2.Laplacian(gray, cv2.CV_32F).var() <= PREFILTER_MIN_LAPLACIAN_VAR:
+        return False
+
+    # Characters next to each other merge into horizontal blobs
+    edges = cv2.Canny(gray, 50, 150)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3))
+    closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+    density = cv2.countNonZero(closed) / closed.size
+    return density >= PREFILTER_MIN_EDGE_DENSITY
+
+
+def exif_orientation(data: bytes) -> int:
+    """EXIF orientation tag of an encoded image (1 = upright); only parses headers."""
+    try:
+        return Image.open(io.BytesIO(data)).getexif().get(0x0112, 1)
+    except Exception:
+        return 1
+
+
+def decode_rgb(path: Path) -> np.ndarray:
+    """
+    Decode an image to an RGB uint8 array with EXIF orientation applied.
+    Upright JPEGs go through libjpeg-turbo when PyTurboJPEG is installed,
+    everything else through OpenCV (which applies EXIF orientation itself);
+    anything OpenCV can't read goes through PIL instead.
+    """
+    data = path.read_bytes()
+    if TJ is not None and path.suffix.lower() in JPEG_EXTS and exif_orientation(data) == 1:
+        try:
+            return TJ.decode(data, pixel_format=TJPF_RGB)
+        except Exception:
+            pass  # not really a JPEG; let OpenCV sniff the format
 
-    # EasyOCR: returns list of (bbox, text, confidence)
-    results = reader.readtext(arr, detail=1, paragraph=False)
+    arr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if arr is None:
+        return np.array(ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB"))
+    return cv2.cvtColor(arr, cv2.COLOR_BGR2RGB)
 
-    if not results:
-        return "none"
 
-    total_chars = sum(len(text) for (_, text, _) in results)
-    if total_chars < MIN_TOTAL_CHARS:
-        return "none"
+def decode_and_resize(path: Path):
+    """
+    Load an image and shrink it to fit within (OCR_HEIGHT, OCR_WIDTH).
+    Padding to the full canvas happens when it is copied into the batch.
 
-    total_text_area = 0.0
-    max_region_area_ratio = 0.0
-    max_region_width_ratio = 0.0
+    Returns (path, arr, w, h), or (path, None, 0, 0) if the image could not
+    be loaded.
+    """
+    try:
+        arr = decode_rgb(path)
+    except Exception:
+        return path, None, 0, 0
 
-    for (bbox, text, conf) in results:
-        xs = [p[0] for p in bbox]
-        ys = [p[1] for p in bbox]
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
+    h, w = arr.shape[:2]
+    scale = min(OCR_WIDTH / w, OCR_HEIGHT / h, 1.0)
+    if scale < 1.0:
+        w, h = max(1, int(w * scale)), max(1, int(h * scale))
+        arr = cv2.resize(arr, (w, h), interpolation=cv2.INTER_AREA)
+
+    return path, arr, w, h
+
+
+def fill_batch(buf: np.ndarray, batch: list) -> np.ndarray:
+    """
+    Copy decoded images into the reused batch buffer, padding each one on the
+    bottom/right so EasyOCR boxes stay in the resized image's coordinates.
+    Returns the filled part of the buffer.
+    """
+    for i, (_, arr, w, h) in enumerate(batch):
+        buf[i, :h, :w] = arr
+        buf[i, :h, w:] = 0
+        buf[i, h:] = 0
+    return buf[:len(batch)]
+
+
+def prefiltered(pool: ThreadPoolExecutor, paths: list[Path]):
+    """
+    Yield (path, likely_has_text) in order, keeping at most PREFILTER_AHEAD
+    checks submitted so a failed run doesn't have to drain a huge job queue.
+    """
+    remaining = iter(paths)
+    pending = collections.deque(
+        (path, pool.submit(likely_has_text, path))
+        for path in itertools.islice(remaining, PREFILTER_AHEAD)
+    )
+    while pending:
+        path, future = pending.popleft()
+        nxt = next(remaining, None)
+        if nxt is not None:
+            pending.append((nxt, pool.submit(likely_has_text, nxt)))
+        yield path, future.result()
+
+
+def decode_worker(
+    paths: list[Path],
+    out_queue: queue.Queue,
+    prefilter_pool: ThreadPoolExecutor,
+    decode_pool: ThreadPoolExecutor,
+) -> None:
+    """
+    Prefilter images and decode the ones that may hold text on the given
+    thread pools, and push everything onto out_queue (in completion order)
+    followed by None once done. Prefiltered images are pushed with NO_TEXT instead of an array. The
+    bounded queue keeps decoding at most a couple of batches ahead of the OCR.
+    If the worker itself fails, the exception is pushed before the None so
+    main() can re-raise it instead of treating it as the end of the input.
+    """
+    try:
+        if USE_TEXT_PREFILTER:
+            gates = prefiltered(prefilter_pool, paths)
+        else:
+            gates = zip(paths, itertools.repeat(True))
+
+        # Keep every decode thread busy and hand images on as they finish
+        in_flight = set()
+        for path, has_text in gates:
+            if not has_text:
+                out_queue.put((path, NO_TEXT, 0, 0))
+                continue
+
+            in_flight.add(decode_pool.submit(decode_and_resize, path))
+            if len(in_flight) >= DECODE_WORKERS:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    out_queue.put(future.result())
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                out_queue.put(future.result())
+    except BaseException as e:
+        out_queue.put(e)
+    finally:
+        out_queue.put(None)
+
+
+def copy_if_missing(src: Path, dst_dir: Path) -> None:
+    out_path = dst_dir / src.name
+    if not out_path.exists():
+        shutil.copy2(src, out_path)
+
+
+def enable_fp16(reader: easyocr.Reader) -> None:
+    """
+    Prepare the reader for running under torch.autocast: model outputs are
+    cast back to float32, since EasyOCR post-processes them with NumPy/OpenCV
+    code that expects float32.
+    """
+    def to_float32(module, inputs, output):
+        if isinstance(output, tuple):
+            return tuple(o.float() for o in output)
+        return output.float()
+
+    reader.detector.register_forward_hook(to_float32)
+    reader.recognizer.register_forward_hook(to_float32)
 
-        width = max_x - min_x
-        height = max_y - min_y
-        area = width * height
 
+def ocr_precision(reader: easyocr.Reader, fp16: bool):
+    """Context to run OCR in: FP16 autocast on CUDA if enabled, else a no-op."""
+    if fp16 and reader.device == "cuda":
+        return torch.autocast(device_type="cuda", dtype=torch.float16)
+    return contextlib.nullcontext()
+
+
+def ocr_settings_fingerprint() -> str:
+    """Everything the cached OCR results depend on besides the image itself."""
+    return f"canvas={OCR_WIDTH}x{OCR_HEIGHT} fp16={USE_FP16} easyocr={easyocr.__version__}"
+
+
+def open_ocr_cache(path: Path, fingerprint: str) -> sqlite3.Connection:
+    """
+    Open the OCR cache, dropping all cached results if they were computed with
+    different OCR settings than `fingerprint`.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, results BLOB)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    row = conn.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()
+    if row is None or row[0] != fingerprint:
+        if row is not None:
+            print(f"OCR settings changed ({row[0]} -> {fingerprint}), clearing OCR cache")
+        conn.execute("DELETE FROM ocr")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('settings', ?)", (fingerprint,))
+        conn.commit()
+    return conn
+
+
+def load_cached_ocr(conn: sqlite3.Connection, key: str):
+    """Returns the cached (results, w, h) for an image."""
+    (blob,) = conn.execute("SELECT results FROM ocr WHERE key = ?", (key,)).fetchone()
+    return pickle.loads(blob)
+
+
+def store_cached_ocr(conn: sqlite3.Connection, key: str, results: list, w: int, h: int) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO ocr (key, results) VALUES (?, ?)",
+        (key, pickle.dumps((results, w, h), protocol=5)),
+    )
+
+
+@numba.njit(cache=True, fastmath=True)
+def _bbox_stats(pts, w, h):
+    """
+    Box geometry for an (N, 4, 2) array of box corners on a w x h image.
+    Returns (total_area_ratio, max_region_area_ratio, max_region_width_ratio);
+    boxes with zero area are ignored.
+    """
+    img_area = float(w * h)
+    total = 0.0
+    max_area_ratio = 0.0
+    max_width_ratio = 0.0
+
+    for i in range(pts.shape[0]):
+        min_x = min_y = 1e18
+        max_x = max_y = -1e18
+        for k in range(4):
+            x = pts[i, k, 0]
+            y = pts[i, k, 1]
+            if x < min_x:
+                min_x = x
+            if x > max_x:
+                max_x = x
+            if y < min_y:
+                min_y = y
+            if y > max_y:
+                max_y = y
+
+        width = max_x - min_x
+        area = width * (max_y - min_y)
         if area <= 0:
             continue
 
-        area_ratio = area / img_area
-        width_ratio = width / w
+        total += area
+        max_area_ratio = max(max_area_ratio, area / img_area)
+        max_width_ratio = max(max_width_ratio, width / w)
+
+    return total / img_area, max_area_ratio, max_width_ratio
 
-        total_text_area += area
-        max_region_area_ratio = max(max_region_area_ratio, area_ratio)
-        max_region_width_ratio = max(max_region_width_ratio, width_ratio)
 
-    total_area_ratio = total_text_area / img_area
+def text_stats(results: list, w: int, h: int) -> tuple:
+    """
+    Summarize EasyOCR results on a w x h image as
+    (max_region_area_ratio, max_region_width_ratio, total_area_ratio, total_chars).
+    """
+    if not results:
+        return 0.0, 0.0, 0.0, 0
+
+    total_chars = sum(len(text) for (_, text, _) in results)
+    pts = np.asarray([bbox for (bbox, _, _) in results], dtype=np.float32)
+    total_area_ratio, max_region_area_ratio, max_region_width_ratio = _bbox_stats(pts, w, h)
+    return max_region_area_ratio, max_region_width_ratio, total_area_ratio, total_chars
 
-    # ---- MEME HEURISTICS ----
-    # If any region is big or text dominates the image, call it meme
-    if (
-        max_region_area_ratio >= MEME_MIN_REGION_AREA_RATIO
-        or max_region_width_ratio >= MEME_MIN_WIDTH_RATIO
-        or total_area_ratio >= MEME_MIN_TOTAL_AREA_RATIO
-        or total_chars >= MEME_MIN_TOTAL_CHARS
-    ):
-        return "meme"
 
-    # ---- OVERLAY HEURISTICS ----
-    # If we got here, there is text but it's relatively small and constrained.
-    # Treat as overlay if within reasonable area limits.
-    if (
-        total_area_ratio <= MAX_OVERLAY_TOTAL_AREA_RATIO
-        and max_region_area_ratio <= MAX_OVERLAY_REGION_AREA_RATIO
-    ):
-        return "overlay"
+# classify_batch codes
+TEXT_TYPES = ("none", "overlay", "meme")
 
-    # Fallback: if it's not clearly overlay and text is not negligible, be conservative → meme
-    return "meme"
+
+@numba.njit(cache=True)
+def classify_batch(stats):
+    """
+    Classify a (B, 4) array of text_stats rows into codes for TEXT_TYPES:
+      - 0 "none"    : no relevant text
+      - 1 "overlay" : small overlays (timestamps, camera UI, VHS subs, etc.)
+      - 2 "meme"    : big caption / meme-style text
+
+    This is heuristic: use bounding box area, total area, and char count.
+    The thresholds are module constants, so numba bakes them into the kernel.
+    """
+    codes = np.empty(stats.shape[0], dtype=np.int8)
+    for i in range(stats.shape[0]):
+        max_region_area_ratio = stats[i, 0]
+        max_region_width_ratio = stats[i, 1]
+        total_area_ratio = stats[i, 2]
+        total_chars = stats[i, 3]
+
+        if total_chars < MIN_TOTAL_CHARS:
+            codes[i] = 0
+
+        # ---- MEME HEURISTICS ----
+        # If any region is big or text dominates the image, call it meme
+        elif (
+            max_region_area_ratio >= MEME_MIN_REGION_AREA_RATIO
+            or max_region_width_ratio >= MEME_MIN_WIDTH_RATIO
+            or total_area_ratio >= MEME_MIN_TOTAL_AREA_RATIO
+            or total_chars >= MEME_MIN_TOTAL_CHARS
+        ):
+            codes[i] = 2
+
+        # ---- OVERLAY HEURISTICS ----
+        # If we got here, there is text but it's relatively small and constrained.
+        # Treat as overlay if within reasonable area limits.
+        elif (
+            total_area_ratio <= MAX_OVERLAY_TOTAL_AREA_RATIO
+            and max_region_area_ratio <= MAX_OVERLAY_REGION_AREA_RATIO
+        ):
+            codes[i] = 1
+
+        # Fallback: if it's not clearly overlay and text is not negligible, be conservative → meme
+        else:
+            codes[i] = 2
+    return codes
+
+
+def classify_text_types(entries: list) -> list[str]:
+    """Classify a list of (results, w, h) entries in one classify_batch call."""
+    if not entries:
+        return []
+    stats = np.array([text_stats(results, w, h) for (results, w, h) in entries], dtype=np.float64)
+    return [TEXT_TYPES[code] for code in classify_batch(stats)]
 
 
 def main():
@@ -117,40 +449,133 @@ def main():
 
     print(f"Found {len(all_paths)} candidate images in {SRC_DIR}")
 
-    # Initialize EasyOCR reader once
-    reader = easyocr.Reader(['en'], gpu=USE_GPU)
+    # Images OCR'd on a previous run are classified straight from the cache
+    cache = open_ocr_cache(OCR_CACHE, ocr_settings_fingerprint())
+    cached_keys = {key for (key,) in cache.execute("SELECT key FROM ocr")}
+    cached_paths = [p for p in all_paths if p.stem in cached_keys]
+    todo_paths = [p for p in all_paths if p.stem not in cached_keys]
 
-    num_kept = 0
-    num_rejected = 0
-
-    with tqdm(all_paths, desc="Filtering images", unit="img") as pbar:
-        for img_path in pbar:
-            try:
-                img = Image.open(img_path)
-            except Exception:
-                # Any error: treat as rejected (put aside to inspect manually)
-                out_path = REJECTED_DIR / img_path.name
-                if not out_path.exists():
-                    shutil.copy2(img_path, out_path)
-                num_rejected += 1
-                pbar.set_postfix(kept=num_kept, rejected=num_rejected)
-                continue
+    print(f"{len(cached_paths)} already in OCR cache, {len(todo_paths)} to OCR")
 
-            text_type = classify_text_type(img, reader)
+    if todo_paths:
+        # Initialize EasyOCR reader once
+        reader = easyocr.Reader(['en'], gpu=USE_GPU, cudnn_benchmark=True)
+        if USE_FP16:
+            enable_fp16(reader)
 
-            if text_type in ("none", "overlay"):
-                out_path = DST_DIR / img_path.name
-                if not out_path.exists():
-                    shutil.copy2(img_path, out_path)
-                num_kept += 1
-            else:  # "meme"
-                out_path = REJECTED_DIR / img_path.name
-                if not out_path.exists():
-                    shutil.copy2(img_path, out_path)
-                num_rejected += 1
+        # Warm up on a dummy batch so cuDNN autotuning happens before the real run
+        with ocr_precision(reader, USE_FP16):
+            reader.readtext_batched(
+                np.zeros((BATCH_SIZE, OCR_HEIGHT, OCR_WIDTH, 3), dtype=np.uint8),
+                n_width=OCR_WIDTH, n_height=OCR_HEIGHT, batch_size=BATCH_SIZE,
+            )
 
+    num_kept = 0
+    num_rejected = 0
+    num_uncommitted = 0
+
+    prefilter_pool = ThreadPoolExecutor(max_workers=PREFILTER_WORKERS)
+    decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS)
+
+    decoded = queue.Queue(maxsize=2 * BATCH_SIZE)
+    feeder = threading.Thread(
+        target=decode_worker,
+        args=(todo_paths, decoded, prefilter_pool, decode_pool),
+        daemon=True,
+    )
+    feeder.start()
+
+    # Host batch buffer, allocated once and refilled for every batch
+    batch_buf = np.empty((BATCH_SIZE, OCR_HEIGHT, OCR_WIDTH, 3), dtype=np.uint8)
+
+    copies = []
+    try:
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS) as copy_pool, \
+                tqdm(total=len(all_paths), desc="Filtering images", unit="img") as pbar:
+
+            def route(img_path: Path, text_type: str) -> None:
+                nonlocal num_kept, num_rejected
+                if text_type in ("none", "overlay"):
+                    copies.append(copy_pool.submit(copy_if_missing, img_path, DST_DIR))
+                    num_kept += 1
+                else:  # "meme" or errors
+                    copies.append(copy_pool.submit(copy_if_missing, img_path, REJECTED_DIR))
+                    num_rejected += 1
+
+            for start in range(0, len(cached_paths), BATCH_SIZE):
+                chunk = cached_paths[start:start + BATCH_SIZE]
+                entries = [load_cached_ocr(cache, img_path.stem) for img_path in chunk]
+                for img_path, text_type in zip(chunk, classify_text_types(entries)):
+                    route(img_path, text_type)
+                pbar.update(len(chunk))
             pbar.set_postfix(kept=num_kept, rejected=num_rejected)
 
+            finished = False
+            while not finished:
+                # Route skipped/failed images as they arrive and keep pulling until
+                # the OCR batch is full, so batches stay at BATCH_SIZE
+                batch = []
+                while len(batch) < BATCH_SIZE:
+                    item = decoded.get()
+                    if item is None:
+                        finished = True
+                        break
+                    if isinstance(item, BaseException):
+                        raise RuntimeError("Image decoding stopped early") from item
+
+                    img_path, arr, _, _ = item
+                    if arr is NO_TEXT:
+                        route(img_path, "none")
+                        pbar.update(1)
+                    elif arr is None:
+                        # Any error: treat as rejected (put aside to inspect manually)
+                        route(img_path, "error")
+                        pbar.update(1)
+                    else:
+                        batch.append(item)
+
+                if batch:
+                    # EasyOCR: one list of (bbox, text, confidence) per image
+                    with ocr_precision(reader, USE_FP16):
+                        results_list = reader.readtext_batched(
+                            fill_batch(batch_buf, batch),
+                            n_width=OCR_WIDTH, n_height=OCR_HEIGHT,
+                            batch_size=BATCH_SIZE, detail=1, paragraph=False,
+                        )
+
+                    entries = []
+                    for (img_path, _, w, h), results in zip(batch, results_list):
+                        store_cached_ocr(cache, img_path.stem, results, w, h)
+                        entries.append((results, w, h))
+
+                    for (img_path, _, _, _), text_type in zip(batch, classify_text_types(entries)):
+                        route(img_path, text_type)
+
+                    # Commit in chunks to avoid an fsync per image
+                    num_uncommitted += len(batch)
+                    if num_uncommitted >= CACHE_COMMIT_EVERY:
+                        cache.commit()
+                        num_uncommitted = 0
+
+                pbar.update(len(batch))
+                pbar.set_postfix(kept=num_kept, rejected=num_rejected)
+    except BaseException:
+        # Drop queued prefilter/decode jobs so exiting doesn't wait for them
+        prefilter_pool.shutdown(wait=False, cancel_futures=True)
+        decode_pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        # Keep whatever was OCR'd, even if the run failed partway
+        cache.commit()
+        cache.close()
+
+    prefilter_pool.shutdown()
+    decode_pool.shutdown()
+
+    # Surface any copy errors
+    for future in copies:
+        future.result()
+
     print("\nDone.")
     print(f"Kept (none/overlay):     {num_kept}")
     print(f"Rejected (meme/errors):  {num_rejected}")
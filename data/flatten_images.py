@@ -1,63 +1,114 @@
 #!/usr/bin/env python3
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import hashlib
+import mmap
 import os
 from pathlib import Path
 import shutil
 
+try:
+    from blake3 import blake3
+except ImportError:  # optional, only needed for --hash blake3
+    blake3 = None
+
 # Allowed image extensions (customize if needed)
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tiff"}
 
+# Supported filename hashes and their hex digest lengths
+HASH_HEX_LENGTHS = {"sha1": 40, "blake3": 64}
+
+# Files at least this big are memory-mapped for hashing
+MMAP_THRESHOLD = 64 * 1024
+
 
 def is_image(path: Path) -> bool:
     return path.is_file() and path.suffix.lower() in IMAGE_EXTS
 
 
-def sha1_of_file(path: Path, chunk_size: int = 8192) -> str:
-    """Compute SHA1 hash of a file, reading in chunks."""
-    h = hashlib.sha1()
-    with path.open("rb") as f:
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            h.update(chunk)
+def new_hasher(algo: str):
+    # Single-threaded: files are already hashed on one process per core
+    if algo == "blake3":
+        return blake3(max_threads=1)
+    return hashlib.sha1()
+
+
+def digest_of_file(path: Path, algo: str = "sha1") -> str:
+    """
+    Compute the content hash of a file, used as its deduplication key.
+    Small files are read in one go; larger ones are memory-mapped so the
+    hasher reads straight from the page cache without a Python read loop.
+    """
+    h = new_hasher(algo)
+    size = path.stat().st_size
+    if size == 0:
+        return h.hexdigest()
+
+    if size < MMAP_THRESHOLD:
+        with path.open("rb") as f:
+            h.update(f.read())
+    elif algo == "blake3":
+        # BLAKE3 maps the file itself
+        h.update_mmap(path)
+    else:
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            h.update(mm)
     return h.hexdigest()
 
 
-def flatten_images(input_dir: Path, output_dir: Path) -> None:
+def check_hash_scheme(existing: set, algo: str, output_dir: Path) -> None:
+    """Refuse to add files to a folder whose images are named by another hash."""
+    lengths = {len(Path(name).stem) for name in existing if Path(name).suffix.lower() in IMAGE_EXTS}
+    if lengths - {HASH_HEX_LENGTHS[algo]}:
+        raise ValueError(
+            f"{output_dir} already contains images not named by {algo}; "
+            "rerun with the --hash it was built with"
+        )
+
+
+def flatten_images(input_dir: Path, output_dir: Path, algo: str = "sha1") -> None:
     if not input_dir.is_dir():
         raise ValueError(f"Input path is not a directory: {input_dir}")
+    if algo not in HASH_HEX_LENGTHS:
+        raise ValueError(f"Unknown hash: {algo}")
+    if algo == "blake3" and blake3 is None:
+        raise ValueError("--hash blake3 requires the 'blake3' package")
 
     # Create destination folder
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    count_total = 0
-    count_copied = 0
-    count_skipped = 0
-
-    # Walk directory tree
+    # Walk directory tree and collect candidates first
+    src_paths = []
     for root, dirs, files in os.walk(input_dir):
         root_path = Path(root)
         for name in files:
             src_path = root_path / name
-            if not is_image(src_path):
-                continue
+            if is_image(src_path):
+                src_paths.append(src_path)
+
+    count_total = len(src_paths)
+    count_copied = 0
+    count_skipped = 0
 
-            count_total += 1
+    # Names already in the output folder, checked once instead of a stat per file
+    existing = {entry.name for entry in os.scandir(output_dir)}
+    check_hash_scheme(existing, algo, output_dir)
 
-            # Compute SHA1 and build destination filename
-            file_hash = sha1_of_file(src_path)
+    # Hash in parallel, but keep all copy decisions in this process
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        digests = ex.map(partial(digest_of_file, algo=algo), src_paths, chunksize=32)
+        for src_path, file_hash in zip(src_paths, digests):
             ext = src_path.suffix.lower() or ".jpg"
             dst_name = f"{file_hash}{ext}"
-            dst_path = output_dir / dst_name
 
-            if dst_path.exists():
-                # Same SHA1 already there -> same content, skip
+            if dst_name in existing:
+                # Same hash already there -> same content, skip
                 count_skipped += 1
                 continue
 
-            shutil.copy2(src_path, dst_path)
+            shutil.copy2(src_path, output_dir / dst_name)
+            existing.add(dst_name)
             count_copied += 1
 
             # Log every 100 copies (optional)
@@ -67,7 +118,7 @@ def flatten_images(input_dir: Path, output_dir: Path) -> None:
     print("--------------------------------------------------")
     print(f"Total image files found: {count_total}")
     print(f"Copied to {output_dir}: {count_copied}")
-    print(f"Skipped (already present by SHA1): {count_skipped}")
+    print(f"Skipped (already present by hash): {count_skipped}")
     print("Done.")
 
 
@@ -75,7 +126,7 @@ def main():
     parser = argparse.ArgumentParser(
         description=(
             "Recursively find all images in a folder and copy them into "
-            "a flat 'data_raw_all' folder using SHA1-based filenames."
+            "a flat 'data_raw_all' folder using content-hash filenames."
         )
     )
     parser.add_argument(
@@ -92,6 +143,15 @@ def main():
             "If not provided, 'data_raw_all' will be created next to input_dir."
         ),
     )
+    parser.add_argument(
+        "--hash",
+        choices=sorted(HASH_HEX_LENGTHS),
+        default="sha1",
+        help=(
+            "Hash used for the output filenames (default: sha1). "
+            "Keep using the one an existing output directory was built with."
+        ),
+    )
 
     args = parser.parse_args()
     input_dir = Path(args.input_dir).expanduser().resolve()
@@ -103,8 +163,9 @@ def main():
 
     print(f"[INFO] Input directory:  {input_dir}")
     print(f"[INFO] Output directory: {output_dir}")
+    print(f"[INFO] Filename hash:    {args.hash}")
 
-    flatten_images(input_dir, output_dir)
+    flatten_images(input_dir, output_dir, args.hash)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,11 @@
+import asyncio
 import os
-import time
 import hashlib
 from urllib.parse import urlparse
-import requests
+import aiofiles
+import aiohttp
+from aiolimiter import AsyncLimiter
+import orjson
 
 # ------------- CONFIG -------------
 SUBREDDITS = [
@@ -20,9 +23,16 @@ OUTPUT_ROOT_DIR = "reddit_cursed_images"
 # If you set it to an int, it will stop after scanning that many posts.
 MAX_POSTS_PER_SUBREDDIT = None
 
-REQUEST_SLEEP = 1.0
+# Listing requests per minute, shared by all subreddits (Reddit limits per client)
+LISTING_REQUESTS_PER_MINUTE = 60
 TIMEOUT = 20
 
+# Subreddits are scraped concurrently, and so are image downloads
+DOWNLOAD_CONCURRENCY = 32
+MAX_CONNECTIONS = 64
+
+USER_AGENT = "script:cursedimages_downloader:v1.1 (by u/yourusername)"
+
 # ------------- UTILS -------------
 
 
@@ -34,27 +44,45 @@ def safe_filename(url: str) -> str:
     return f"{h}{ext}"
 
 
-def download_image(url: str, out_dir: str) -> bool:
-    os.makedirs(out_dir, exist_ok=True)
-    filename = safe_filename(url)
-    path = os.path.join(out_dir, filename)
+def list_downloaded(root_dir: str) -> set:
+    """Filenames (= URL hashes) already downloaded into any subreddit folder."""
+    names = set()
+    for _, _, files in os.walk(root_dir):
+        names.update(files)
+    return names
 
-    if os.path.exists(path):
-        return False
 
-    try:
-        resp = requests.get(url, timeout=TIMEOUT, stream=True)
-        resp.raise_for_status()
-    except Exception:
+async def adownload(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    url: str,
+    out_dir: str,
+    existing: set,
+) -> bool:
+    filename = safe_filename(url)
+    if filename in existing:
         return False
 
+    # Claim the name before the first await so concurrent duplicates skip it
+    existing.add(filename)
+    path = os.path.join(out_dir, filename)
+
+    # Stream into a .part file and only rename it once complete, so an
+    # interrupted download never looks finished to the next run
+    part_path = path + ".part"
+
     try:
-        with open(path, "wb") as f:
-            for chunk in resp.iter_content(8192):
-                if chunk:
-                    f.write(chunk)
+        async with sem, session.get(url) as resp:
+            resp.raise_for_status()
+            async with aiofiles.open(part_path, "wb") as f:
+                async for chunk in resp.content.iter_chunked(65536):
+                    await f.write(chunk)
+        os.replace(part_path, path)
         return True
     except Exception:
+        existing.discard(filename)
+        if os.path.exists(part_path):
+            os.remove(part_path)
         return False
 
 
@@ -98,16 +126,18 @@ def extract_image_urls_from_post(post_data: dict) -> list:
 # ------------- CORE PER-SUBREDDIT LOGIC -------------
 
 
-def scrape_subreddit(subreddit: str) -> int:
+async def scrape_subreddit(
+    session: aiohttp.ClientSession,
+    listing_limiter: AsyncLimiter,
+    download_sem: asyncio.Semaphore,
+    existing: set,
+    subreddit: str,
+) -> int:
     print(f"\n[INFO] Scraping r/{subreddit} ...")
 
     # Each subreddit goes to its own folder
     out_dir = os.path.join(OUTPUT_ROOT_DIR, subreddit)
-
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "script:cursedimages_downloader:v1.1 (by u/yourusername)"
-    })
+    os.makedirs(out_dir, exist_ok=True)
 
     after = None
     scanned_posts = 0
@@ -123,44 +153,46 @@ def scrape_subreddit(subreddit: str) -> int:
             params["after"] = after
 
         try:
-            resp = session.get(
+            async with listing_limiter, session.get(
                 f"https://www.reddit.com/r/{subreddit}/.json",
                 params=params,
-                timeout=TIMEOUT
-            )
-            resp.raise_for_status()
+            ) as resp:
+                resp.raise_for_status()
+                data = orjson.loads(await resp.read())
         except Exception as e:
             print(f"[ERROR] Cannot fetch subreddit listing for r/{subreddit}: {e}")
             break
 
-        data = resp.json()
         posts = data.get("data", {}).get("children", [])
         after = data.get("data", {}).get("after")
 
         if not posts:
-            print("[INFO] No more posts.")
+            print(f"[INFO][r/{subreddit}] No more posts.")
             break
 
+        image_urls = []
         for post in posts:
             scanned_posts += 1
             post_data = post.get("data", {})
-            image_urls = extract_image_urls_from_post(post_data)
-
-            for u in image_urls:
-                if download_image(u, out_dir):
-                    downloaded_count += 1
-                    if downloaded_count % 100 == 0:
-                        print(f"[LOG][r/{subreddit}] Downloaded {downloaded_count} images so far")
+            image_urls.extend(extract_image_urls_from_post(post_data))
 
             # Again, only check the limit if it's not None
             if MAX_POSTS_PER_SUBREDDIT is not None and scanned_posts >= MAX_POSTS_PER_SUBREDDIT:
                 break
 
+        # Download the whole page's images concurrently
+        results = await asyncio.gather(*[
+            adownload(session, download_sem, u, out_dir, existing) for u in image_urls
+        ])
+        for ok in results:
+            if ok:
+                downloaded_count += 1
+                if downloaded_count % 100 == 0:
+                    print(f"[LOG][r/{subreddit}] Downloaded {downloaded_count} images so far")
+
         if not after:
             break
 
-        time.sleep(REQUEST_SLEEP)
-
     print(f"[DONE][r/{subreddit}] Total scanned posts: {scanned_posts}")
     print(f"[DONE][r/{subreddit}] Total images downloaded from this subreddit: {downloaded_count}")
 
@@ -171,15 +203,39 @@ def scrape_subreddit(subreddit: str) -> int:
 # ------------- MAIN -------------
 
 
-def main():
-    os.makedirs(OUTPUT_ROOT_DIR, exist_ok=True)
+async def scrape_all() -> int:
+    listing_limiter = AsyncLimiter(LISTING_REQUESTS_PER_MINUTE, 60)
+    download_sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+    # Filenames already on disk in any subreddit, listed once instead of a stat
+    # per URL; shared so crossposts are only downloaded once per run
+    existing = list_downloaded(OUTPUT_ROOT_DIR)
 
     total_downloaded_all = 0
 
-    for subreddit in SUBREDDITS:
-        downloaded_from_sub = scrape_subreddit(subreddit)
-        total_downloaded_all += downloaded_from_sub
-        print(f"[AGGREGATE] After r/{subreddit}: {total_downloaded_all} total images downloaded across all subreddits so far")
+    # One client for everything, so connections (and TLS handshakes) get reused
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers={"User-Agent": USER_AGENT},
+        timeout=aiohttp.ClientTimeout(sock_connect=TIMEOUT, sock_read=TIMEOUT),
+    ) as session:
+        counts = await asyncio.gather(*[
+            scrape_subreddit(session, listing_limiter, download_sem, existing, subreddit)
+            for subreddit in SUBREDDITS
+        ])
+
+        for subreddit, downloaded_from_sub in zip(SUBREDDITS, counts):
+            total_downloaded_all += downloaded_from_sub
+            print(f"[AGGREGATE] After r/{subreddit}: {total_downloaded_all} total images downloaded across all subreddits so far")
+
+    return total_downloaded_all
+
+
+def main():
+    os.makedirs(OUTPUT_ROOT_DIR, exist_ok=True)
+
+    total_downloaded_all = asyncio.run(scrape_all())
 
     print("\n==============================")
     print(f"[GLOBAL DONE] Total images downloaded from all subreddits: {total_downloaded_all}")